@@ -1,12 +1,15 @@
 # client.py
 import socket
 import time
+from typing import List
 
 from protocol import (
     UDP_PORT,
     unpack_offer,
     pack_request,
-    recv_exact,
+    recv_exact_into,
+    tune_tcp_socket,
+    quick_ack,
     unpack_server_payload,
     pack_client_payload,
     SERVER_PAYLOAD_SIZE,
@@ -16,7 +19,7 @@ from protocol import (
     RESULT_TIE,
 )
 
-from game import card_to_string, hand_value
+from game import BUST_LIMIT, RANK_VALUES, card_to_string
 
 CLIENT_NAME = "Hittt Happens"
 
@@ -58,32 +61,41 @@ def _result_to_text(result: int) -> str:
     return f"UNKNOWN({result})"
 
 
-def _read_one_server_payload(tcp: socket.socket):
-    data = recv_exact(tcp, SERVER_PAYLOAD_SIZE)
-    if data is None:
+def _read_one_server_payload(tcp: socket.socket, buf: bytearray):
+    if not recv_exact_into(tcp, buf, SERVER_PAYLOAD_SIZE):
         raise ConnectionError("Server closed connection.")
-    parsed = unpack_server_payload(data)
+    quick_ack(tcp)
+    parsed = unpack_server_payload(buf)
     if not parsed:
         raise ValueError("Invalid server payload.")
     return parsed  # (result, rank, suit)
 
 
+def _record(result: int, counters: List[int]):
+    print("[CLIENT] Round result:", _result_to_text(result))
+    # Anything that is not a win or a loss is counted as a tie, as before.
+    counters[result if result in (RESULT_WIN, RESULT_LOSS) else RESULT_TIE] += 1
+
+
 def play_session(tcp: socket.socket, rounds: int):
-    wins = losses = ties = 0
+    counters = [0, 0, 0, 0]  # indexed by result code
+    buf = bytearray(SERVER_PAYLOAD_SIZE)
 
     for r in range(1, rounds + 1):
         print(f"\n[CLIENT] === Round {r}/{rounds} ===")
 
         player_cards = []
         dealer_cards = []
+        player_sum = 0
 
         # Initial deal: expect 3 cards: player, player, dealer upcard (all NOT_OVER)
         for _ in range(3):
-            result, rank, suit = _read_one_server_payload(tcp)
+            result, rank, suit = _read_one_server_payload(tcp, buf)
             card = (rank, suit)
 
             if len(player_cards) < 2:
                 player_cards.append(card)
+                player_sum += RANK_VALUES[rank]
                 print("[CLIENT] Player card:", card_to_string(card))
             else:
                 dealer_cards.append(card)
@@ -95,24 +107,17 @@ def play_session(tcp: socket.socket, rounds: int):
         # Player turn
         round_done = False
         while not round_done:
-            ps = hand_value(player_cards)
+            ps = player_sum
             print(f"[CLIENT] Player sum = {ps}")
 
             # If local bust happens (should occur only after receiving a Hit card),
             # do not send more decisions; just wait for server final result.
-            if ps > 21:
+            if ps > BUST_LIMIT:
                 print("[CLIENT] Player bust locally. Waiting for server final result...")
                 while True:
-                    result2, r2, s2 = _read_one_server_payload(tcp)
+                    result2, r2, s2 = _read_one_server_payload(tcp, buf)
                     if result2 != RESULT_NOT_OVER:
-                        txt = _result_to_text(result2)
-                        print("[CLIENT] Round result:", txt)
-                        if result2 == RESULT_WIN:
-                            wins += 1
-                        elif result2 == RESULT_LOSS:
-                            losses += 1
-                        else:
-                            ties += 1
+                        _record(result2, counters)
                         round_done = True
                         break
                 break
@@ -125,7 +130,7 @@ def play_session(tcp: socket.socket, rounds: int):
                 # Dealer phase: read until result != NOT_OVER
                 revealed_hole = False
                 while True:
-                    result, rank, suit = _read_one_server_payload(tcp)
+                    result, rank, suit = _read_one_server_payload(tcp, buf)
                     dealer_cards.append((rank, suit))
                     if not revealed_hole:
                         print("[CLIENT] Dealer reveals hole:", card_to_string((rank, suit)))
@@ -134,37 +139,25 @@ def play_session(tcp: socket.socket, rounds: int):
                         print("[CLIENT] Dealer draws:", card_to_string((rank, suit)))
 
                     if result != RESULT_NOT_OVER:
-                        txt = _result_to_text(result)
-                        print("[CLIENT] Round result:", txt)
-                        if result == RESULT_WIN:
-                            wins += 1
-                        elif result == RESULT_LOSS:
-                            losses += 1
-                        else:
-                            ties += 1
+                        _record(result, counters)
                         round_done = True
                         break
                 break
 
             # decision == Hittt:
             # Read server response (a card; sometimes may include final result too)
-            result, rank, suit = _read_one_server_payload(tcp)
+            result, rank, suit = _read_one_server_payload(tcp, buf)
             player_cards.append((rank, suit))
+            player_sum += RANK_VALUES[rank]
             print("[CLIENT] Player draws:", card_to_string((rank, suit)))
 
             if result != RESULT_NOT_OVER:
-                txt = _result_to_text(result)
-                print("[CLIENT] Round result:", txt)
-                if result == RESULT_WIN:
-                    wins += 1
-                elif result == RESULT_LOSS:
-                    losses += 1
-                else:
-                    ties += 1
+                _record(result, counters)
                 round_done = True
                 break
             # else: loop continues; if bust locally, handled at top of loop
 
+    wins, losses, ties = counters[RESULT_WIN], counters[RESULT_LOSS], counters[RESULT_TIE]
     total = wins + losses + ties
     win_rate = (wins / total) if total else 0.0
     print(f"\n[CLIENT] Finished playing {total} rounds, win rate: {win_rate:.2%} (W={wins}, L={losses}, T={ties})")
@@ -183,9 +176,14 @@ def main():
     udp.bind(("", UDP_PORT))
     print(f"[CLIENT] Client started, listening for offers on UDP port {UDP_PORT}...")
 
+    # One buffer is reused for every datagram. Offers are 39 bytes, but other programs may
+    # broadcast larger packets on this port and Windows raises (WSAEMSGSIZE) instead of truncating.
+    offer_buf = bytearray(2048)
+    offer_view = memoryview(offer_buf)
+
     while True:
-        data, (ip, _) = udp.recvfrom(2048)
-        parsed = unpack_offer(data)
+        nbytes, (ip, _) = udp.recvfrom_into(offer_buf)
+        parsed = unpack_offer(offer_view[:nbytes])
         if not parsed:
             continue
 
@@ -200,6 +198,7 @@ def main():
         try:
             tcp = socket.create_connection((ip, tcp_port), timeout=TCP_CONNECT_TIMEOUT)
             tcp.settimeout(TCP_READ_TIMEOUT)
+            tune_tcp_socket(tcp)
 
             req = pack_request(rounds, CLIENT_NAME)
             tcp.sendall(req)
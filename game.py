@@ -7,26 +7,27 @@ Card = Tuple[int, int]  # (rank 1-13, suit 0-3)
 SUITS_SHORT = ["H", "D", "C", "S"]
 SUITS_LONG  = ["Hearts", "Diamonds", "Clubs", "Spades"]
 
+# The 52 card tuples are built once; each new deck is a shuffled copy.
+_FULL_DECK = tuple((rank, suit) for rank in range(1, 14) for suit in range(4))
+
 def create_deck() -> List[Card]:
-    deck: List[Card] = []
-    for rank in range(1, 14):
-        for suit in range(4):
-            deck.append((rank, suit))
+    deck = list(_FULL_DECK)
     random.shuffle(deck)
     return deck
 
-def card_value(rank: int) -> int:
-    # Ace is always 11 in this assignment.
-    if rank == 1:
-        return 11
-    if rank >= 11:
-        return 10
-    return rank
+# Blackjack value indexed by rank (index 0 unused). Ace is always 11 in this assignment.
+RANK_VALUES = (0, 11, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10)
+
+BUST_LIMIT = 21        # a total above this loses
+DEALER_STANDS_ON = 17  # dealer draws while below this
+
+_RANK_NAMES = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
 
-def hand_value(hand: List[Card]) -> int:
-    return sum(card_value(r) for r, _ in hand)
+# All 52 names, indexed by (rank - 1) * 4 + suit
+_CARD_STR = tuple(f"{rank_str} of {suit_str}" for rank_str in _RANK_NAMES for suit_str in SUITS_LONG)
 
 def card_to_string(card: Card) -> str:
     rank, suit = card
-    rank_str = {1: "A", 11: "J", 12: "Q", 13: "K"}.get(rank, str(rank))
-    return f"{rank_str} of {SUITS_LONG[suit]}"
+    if not (1 <= rank <= 13 and 0 <= suit <= 3):
+        raise ValueError(f"invalid card {card!r}")
+    return _CARD_STR[(rank - 1) * 4 + suit]
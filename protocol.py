@@ -1,4 +1,5 @@
 # protocol.py
+import asyncio
 import struct
 import socket
 from typing import Optional, Tuple
@@ -23,48 +24,56 @@ REQUEST_SIZE        = 4 + 1 + 1 + NAME_LEN          # 38
 CLIENT_PAYLOAD_SIZE = 4 + 1 + 5                      # 10  ("Hittt"/"Stand")
 SERVER_PAYLOAD_SIZE = 4 + 1 + 1 + 2 + 1              # 9   (result + rank(2) + suit(1))
 
+# Precompiled headers (avoids re-parsing the format string on every message)
+_OFFER = struct.Struct("!IBH")      # cookie, type, tcp_port
+_REQ   = struct.Struct("!IBB")      # cookie, type, rounds
+_CLI   = struct.Struct("!IB")       # cookie, type (+ 5-byte decision)
+_SRV   = struct.Struct("!IBBHB")    # cookie, type, result, rank, suit
+
 def _pack_name(name: str) -> bytes:
     raw = name.encode("utf-8", errors="ignore")[:NAME_LEN]
     return raw.ljust(NAME_LEN, b"\x00")
 
 def _unpack_name(b: bytes) -> str:
-    return b.split(b"\x00", 1)[0].decode("utf-8", errors="ignore")
+    i = b.find(b"\x00")
+    return (b[:i] if i >= 0 else b).decode("utf-8", errors="ignore")
 
 def pack_offer(tcp_port: int, server_name: str) -> bytes:
-    return struct.pack("!IBH", MAGIC_COOKIE, TYPE_OFFER, tcp_port & 0xFFFF) + _pack_name(server_name)
+    return _OFFER.pack(MAGIC_COOKIE, TYPE_OFFER, tcp_port & 0xFFFF) + _pack_name(server_name)
 
-def unpack_offer(data: bytes) -> Optional[Tuple[int, str]]:
+def unpack_offer(data) -> Optional[Tuple[int, str]]:
+    """Parse an offer from any buffer (bytes, bytearray or a memoryview over a receive buffer)."""
     if len(data) < OFFER_SIZE:
         return None
-    cookie, mtype, tcp_port = struct.unpack("!IBH", data[:7])
+    cookie, mtype, tcp_port = _OFFER.unpack_from(data, 0)
     if cookie != MAGIC_COOKIE or mtype != TYPE_OFFER:
         return None
-    name = _unpack_name(data[7:7+NAME_LEN])
+    name = _unpack_name(bytes(data[_OFFER.size:_OFFER.size+NAME_LEN]))
     return tcp_port, name
 
 def pack_request(num_rounds: int, client_name: str) -> bytes:
     # cookie(4) + type(1) + rounds(1) + name(32)
-    return struct.pack("!IBB", MAGIC_COOKIE, TYPE_REQUEST, num_rounds & 0xFF) + _pack_name(client_name)
+    return _REQ.pack(MAGIC_COOKIE, TYPE_REQUEST, num_rounds & 0xFF) + _pack_name(client_name)
 
 def unpack_request(data: bytes) -> Optional[Tuple[int, str]]:
     if len(data) < REQUEST_SIZE:
         return None
-    cookie, mtype, rounds = struct.unpack("!IBB", data[:6])
+    cookie, mtype, rounds = _REQ.unpack_from(data, 0)
     if cookie != MAGIC_COOKIE or mtype != TYPE_REQUEST:
         return None
-    name = _unpack_name(data[6:6+NAME_LEN])
+    name = _unpack_name(data[_REQ.size:_REQ.size+NAME_LEN])
     return rounds, name
 
 def pack_client_payload(decision: str) -> bytes:
     # exactly 5 bytes: "Hittt" or "Stand"
     if decision not in ("Hittt", "Stand"):
         raise ValueError("decision must be exactly 'Hittt' or 'Stand'")
-    return struct.pack("!IB", MAGIC_COOKIE, TYPE_PAYLOAD) + decision.encode("ascii")
+    return _CLI.pack(MAGIC_COOKIE, TYPE_PAYLOAD) + decision.encode("ascii")
 
-def unpack_client_payload(data: bytes) -> Optional[str]:
-    if len(data) != CLIENT_PAYLOAD_SIZE:
+def unpack_client_payload(data) -> Optional[str]:
+    if len(data) < CLIENT_PAYLOAD_SIZE:
         return None
-    cookie, mtype = struct.unpack("!IB", data[:5])
+    cookie, mtype = _CLI.unpack_from(data, 0)
     if cookie != MAGIC_COOKIE or mtype != TYPE_PAYLOAD:
         return None
     decision = data[5:10].decode("ascii", errors="ignore")
@@ -74,24 +83,65 @@ def unpack_client_payload(data: bytes) -> Optional[str]:
 
 def pack_server_payload(result_code: int, rank: int, suit: int) -> bytes:
     # cookie(4) + type(1) + result(1) + rank(2) + suit(1)
-    return struct.pack("!IBBHB", MAGIC_COOKIE, TYPE_PAYLOAD, result_code & 0xFF, rank & 0xFFFF, suit & 0xFF)
-
-def unpack_server_payload(data: bytes) -> Optional[Tuple[int, int, int]]:
-    if len(data) != SERVER_PAYLOAD_SIZE:
+    return _SRV.pack(MAGIC_COOKIE, TYPE_PAYLOAD, result_code & 0xFF, rank & 0xFFFF, suit & 0xFF)
+
+# Every (result, rank, suit) message prebuilt: 4 results x 13 ranks x 4 suits.
+SERVER_PAYLOADS = [
+    pack_server_payload(res, rk, su)
+    for res in (RESULT_NOT_OVER, RESULT_TIE, RESULT_LOSS, RESULT_WIN)
+    for rk in range(1, 14)
+    for su in range(4)
+]
+
+def server_payload(result_code: int, rank: int, suit: int) -> bytes:
+    """Prebuilt equivalent of pack_server_payload for valid cards."""
+    return SERVER_PAYLOADS[result_code * 52 + (rank - 1) * 4 + suit]
+
+def unpack_server_payload(data) -> Optional[Tuple[int, int, int]]:
+    if len(data) < SERVER_PAYLOAD_SIZE:
         return None
-    cookie, mtype, result, rank, suit = struct.unpack("!IBBHB", data)
+    cookie, mtype, result, rank, suit = _SRV.unpack_from(data, 0)
     if cookie != MAGIC_COOKIE or mtype != TYPE_PAYLOAD:
         return None
+    # Ranks/suits index lookup tables on the client, so reject anything that is not a real card.
+    if not (1 <= rank <= 13 and 0 <= suit <= 3):
+        return None
     return result, rank, suit
 
-def recv_exact(sock: socket.socket, n: int) -> Optional[bytes]:
-    """Read exactly n bytes from TCP. Return None if peer closed. Raises socket.timeout on timeout."""
-    chunks = []
+TCP_SOCKET_BUFFER = 64 * 1024
+
+def tune_tcp_socket(sock: socket.socket) -> None:
+    """Disable Nagle and pin buffer sizes for the small request/response messages."""
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, TCP_SOCKET_BUFFER)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, TCP_SOCKET_BUFFER)
+
+def quick_ack(sock: socket.socket) -> None:
+    """Ask Linux to ACK immediately (the flag is reset by the kernel, so call after each recv)."""
+    if hasattr(socket, "TCP_QUICKACK"):
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        except OSError:
+            pass
+
+def recv_exact_into(sock: socket.socket, buf: bytearray, n: int) -> bool:
+    """Fill buf[:n] from TCP without allocating. Return False if peer closed. Raises socket.timeout on timeout."""
+    mv = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(mv[got:n])
+        if not k:
+            return False
+        got += k
+    return True
+
+async def sock_recv_exact_into(loop: asyncio.AbstractEventLoop, sock: socket.socket, buf: bytearray, n: int) -> bool:
+    """Event-loop version of recv_exact_into for non-blocking sockets."""
+    mv = memoryview(buf)
     got = 0
     while got < n:
-        part = sock.recv(n - got)
-        if not part:
-            return None
-        chunks.append(part)
-        got += len(part)
-    return b"".join(chunks)
+        k = await loop.sock_recv_into(sock, mv[got:n])
+        if not k:
+            return False
+        got += k
+    return True
@@ -1,31 +1,66 @@
 # server.py
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
 import socket
-import threading
-from typing import Tuple
+import sys
+from typing import List, Tuple
+
+try:
+    import psutil  # optional: per-interface broadcast addresses
+except ImportError:
+    psutil = None
 
 from protocol import (
     UDP_PORT,
     pack_offer,
-    recv_exact,
+    sock_recv_exact_into,
+    tune_tcp_socket,
     unpack_request,
     unpack_client_payload,
-    pack_server_payload,
+    server_payload,
     REQUEST_SIZE,
     CLIENT_PAYLOAD_SIZE,
+    SERVER_PAYLOAD_SIZE,
     RESULT_NOT_OVER,
     RESULT_WIN,
     RESULT_LOSS,
     RESULT_TIE,
 )
 
-from game import create_deck, hand_value, card_to_string
+from game import BUST_LIMIT, DEALER_STANDS_ON, RANK_VALUES, Card, create_deck, card_to_string
 
 SERVER_NAME = "Reliable Dealers"
 TCP_BACKLOG = 50
+# CPUs this process may run on (respects cpusets/containers where the OS exposes them)
+USABLE_CPUS = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+WORKER_COUNT = len(USABLE_CPUS)  # event-loop processes sharing the TCP port
+LOG_LEVEL = os.environ.get("SERVER_LOG_LEVEL", "WARNING").upper()  # DEBUG traces every card and decision
+RESHUFFLE_THRESHOLD = 20  # fresh deck when fewer cards remain (a round can never use this many)
 
 # Timeouts (seconds)
 TCP_CLIENT_TIMEOUT = 120.0  # waiting for client decisions / messages
 
+log = logging.getLogger(__name__)
+
+# Scratch buffers shared across sessions; LIFO keeps recently used (cache-warm) ones on top.
+# Sized for every message a client sends, so the session request is read into it too.
+# Only touched from this process's event loop thread, so a plain list needs no locking.
+_BUFPOOL: List[bytearray] = []
+
+
+def _get_buf() -> bytearray:
+    if _BUFPOOL:
+        return _BUFPOOL.pop()
+    return bytearray(max(REQUEST_SIZE, SERVER_PAYLOAD_SIZE, CLIENT_PAYLOAD_SIZE))
+
+
+def _put_buf(buf: bytearray):
+    _BUFPOOL.append(buf)
+
+
 def get_local_ip() -> str:
     """
     Best-effort way to get the LAN IP used to reach the outside.
@@ -41,103 +76,166 @@ def get_local_ip() -> str:
         s.close()
 
 
-def udp_broadcast_loop(tcp_port: int, stop_event: threading.Event):
+def broadcast_addresses() -> List[str]:
+    """Directed broadcast address of every IPv4 interface, or the limited broadcast as fallback."""
+    if psutil is None:
+        return ["<broadcast>"]
+    addrs = {
+        a.broadcast
+        for nic in psutil.net_if_addrs().values()
+        for a in nic
+        if a.family == socket.AF_INET and a.broadcast
+    }
+    return sorted(addrs) or ["<broadcast>"]
+
+
+async def udp_broadcast_loop(tcp_port: int):
     udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     udp.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    udp.setblocking(False)
 
     msg = pack_offer(tcp_port, SERVER_NAME)
+    targets = [(addr, UDP_PORT) for addr in broadcast_addresses()]
     print(f"[SERVER] Broadcasting offers on UDP {UDP_PORT} (tcp_port={tcp_port})")
 
-    while not stop_event.is_set():
-        try:
-            udp.sendto(msg, ("<broadcast>", UDP_PORT))
-        except OSError:
-            # Broadcast may fail on some networks; keep trying.
-            pass
-        stop_event.wait(1.0)
-
-    udp.close()
+    try:
+        while True:
+            for target in targets:
+                try:
+                    udp.sendto(msg, target)
+                except OSError:
+                    # Broadcast may fail on some networks; keep trying.
+                    pass
+            await asyncio.sleep(1.0)
+    finally:
+        udp.close()
 
 
-def send_card(conn: socket.socket, card: Tuple[int, int], result_code: int = RESULT_NOT_OVER):
+async def send_card(conn: socket.socket, card: Tuple[int, int], result_code: int = RESULT_NOT_OVER):
     rank, suit = card
-    conn.sendall(pack_server_payload(result_code, rank, suit))
+    await asyncio.get_running_loop().sock_sendall(conn, server_payload(result_code, rank, suit))
 
 
-def play_one_round(conn: socket.socket) -> int:
+async def send_payloads(conn: socket.socket, payloads: List[bytes]):
+    """Write prebuilt payloads with one gathering sendmsg; plain sendall where sendmsg is missing."""
+    loop = asyncio.get_running_loop()
+    if hasattr(conn, "sendmsg"):
+        try:
+            # No MSG_ZEROCOPY: a batch is at most ~100 bytes, far below where page pinning
+            # and error-queue completions cost less than the copy they save (~10 KB).
+            sent = conn.sendmsg(payloads)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        if sent == len(payloads) * SERVER_PAYLOAD_SIZE:
+            return
+        # Partial write (send buffer full): let the event loop finish the rest.
+        await loop.sock_sendall(conn, b"".join(payloads)[sent:])
+    else:
+        await loop.sock_sendall(conn, b"".join(payloads))
+
+
+async def recv_from_client(conn: socket.socket, buf: bytearray, n: int) -> bool:
+    """Fill buf[:n]; False if the client closed. Raises asyncio.TimeoutError after TCP_CLIENT_TIMEOUT."""
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(sock_recv_exact_into(loop, conn, buf, n), TCP_CLIENT_TIMEOUT)
+
+
+async def play_one_round(conn: socket.socket, buf: bytearray, deck: List[Card]) -> int:
     """
-    Plays one simplified blackjack round.
+    Plays one simplified blackjack round. `buf` is the connection's receive scratch buffer;
+    `deck` is the session's shoe, which the caller keeps topped up.
     Returns result code: RESULT_WIN / RESULT_LOSS / RESULT_TIE
     Protocol convention:
       - Server sends cards in the exact order events happen.
       - Final message has result != 0 and repeats the last card sent.
     """
-    deck = create_deck()
     player = [deck.pop(), deck.pop()]
     dealer = [deck.pop(), deck.pop()]
-
-    print(f"    [ROUND] Player: {card_to_string(player[0])}, {card_to_string(player[1])}")
-    print(f"    [ROUND] Dealer upcard: {card_to_string(dealer[0])} (hole hidden)")
-
-    # Initial deal: player 2 cards, dealer 1 upcard (all NOT_OVER)
-    send_card(conn, player[0], RESULT_NOT_OVER)
-    send_card(conn, player[1], RESULT_NOT_OVER)
-    send_card(conn, dealer[0], RESULT_NOT_OVER)
+    # Running totals, updated on every draw instead of re-summing the hands
+    player_sum = RANK_VALUES[player[0][0]] + RANK_VALUES[player[1][0]]
+    dealer_sum = RANK_VALUES[dealer[0][0]] + RANK_VALUES[dealer[1][0]]
+
+    # Card names are only formatted when round tracing is enabled
+    debug = log.isEnabledFor(logging.DEBUG)
+    if debug:
+        log.debug("    [ROUND] Player: %s, %s", card_to_string(player[0]), card_to_string(player[1]))
+        log.debug("    [ROUND] Dealer upcard: %s (hole hidden)", card_to_string(dealer[0]))
+
+    # Initial deal: player 2 cards, dealer 1 upcard (all NOT_OVER), one write
+    await send_payloads(conn, [
+        server_payload(RESULT_NOT_OVER, *player[0]),
+        server_payload(RESULT_NOT_OVER, *player[1]),
+        server_payload(RESULT_NOT_OVER, *dealer[0]),
+    ])
     last_card_sent = dealer[0]
 
     # Player turn: hit/stand repeatedly until bust or stand
     while True:
-        if hand_value(player) > 21:
-            print(f"    [ROUND] Player busts with {hand_value(player)}")
-            # bust: send final result with last drawn card (the bust-causing card is already in player[-1])
+        if player_sum > BUST_LIMIT:
+            log.debug("    [ROUND] Player busts with %d", player_sum)
+            # bust on the initial deal (two aces): send final result with the last player card
             last_card_sent = player[-1]
-            send_card(conn, last_card_sent, RESULT_LOSS)
+            await send_card(conn, last_card_sent, RESULT_LOSS)
             return RESULT_LOSS
 
-        data = recv_exact(conn, CLIENT_PAYLOAD_SIZE)
-        if data is None:
+        if not await recv_from_client(conn, buf, CLIENT_PAYLOAD_SIZE):
             raise ConnectionError("Client disconnected during player turn.")
-        decision = unpack_client_payload(data)
+        decision = unpack_client_payload(buf)
         if decision is None:
             raise ConnectionError("Invalid client payload")
 
-        print(f"    [ROUND] Client decision: {decision}")
+        log.debug("    [ROUND] Client decision: %s", decision)
 
         if decision == "Hittt":
             card = deck.pop()
             player.append(card)
+            player_sum += RANK_VALUES[card[0]]
             last_card_sent = card
-            print(f"    [ROUND] Player draws: {card_to_string(card)} (sum={hand_value(player)})")
-            send_card(conn, card, RESULT_NOT_OVER)
+            if debug:
+                log.debug("    [ROUND] Player draws: %s (sum=%d)", card_to_string(card), player_sum)
+            if player_sum > BUST_LIMIT:
+                # Bust on a hit: the drawn card and the final result go out in one write
+                log.debug("    [ROUND] Player busts with %d", player_sum)
+                await send_payloads(conn, [
+                    server_payload(RESULT_NOT_OVER, *card),
+                    server_payload(RESULT_LOSS, *card),
+                ])
+                return RESULT_LOSS
+            await send_card(conn, card, RESULT_NOT_OVER)
             continue
 
         # Stand
         break
 
-    # Dealer turn (only if player didn't bust)
-    print(f"    [ROUND] Dealer reveals hole: {card_to_string(dealer[1])}")
+    # Dealer turn (only if player didn't bust). The client sends nothing until
+    # the round ends, so the whole dealer phase is buffered and written once.
+    if debug:
+        log.debug("    [ROUND] Dealer reveals hole: %s", card_to_string(dealer[1]))
     last_card_sent = dealer[1]
-    send_card(conn, dealer[1], RESULT_NOT_OVER)
+    pending = [server_payload(RESULT_NOT_OVER, *dealer[1])]
 
-    while hand_value(dealer) < 17:
+    while dealer_sum < DEALER_STANDS_ON:
         card = deck.pop()
         dealer.append(card)
+        dealer_sum += RANK_VALUES[card[0]]
         last_card_sent = card
-        print(f"    [ROUND] Dealer draws: {card_to_string(card)} (sum={hand_value(dealer)})")
-        send_card(conn, card, RESULT_NOT_OVER)
-
-        if hand_value(dealer) > 21:
-            print(f"    [ROUND] Dealer busts with {hand_value(dealer)}")
-            send_card(conn, last_card_sent, RESULT_WIN)
+        if debug:
+            log.debug("    [ROUND] Dealer draws: %s (sum=%d)", card_to_string(card), dealer_sum)
+        pending.append(server_payload(RESULT_NOT_OVER, *card))
+
+        if dealer_sum > BUST_LIMIT:
+            log.debug("    [ROUND] Dealer busts with %d", dealer_sum)
+            pending.append(server_payload(RESULT_WIN, *last_card_sent))
+            await send_payloads(conn, pending)
             return RESULT_WIN
 
     # Decide winner
-    ps = hand_value(player)
-    ds = hand_value(dealer)
+    ps = player_sum
+    ds = dealer_sum
 
-    if ps > 21:
+    if ps > BUST_LIMIT:
         result = RESULT_LOSS
-    elif ds > 21:
+    elif ds > BUST_LIMIT:
         result = RESULT_WIN
     elif ps > ds:
         result = RESULT_WIN
@@ -146,18 +244,19 @@ def play_one_round(conn: socket.socket) -> int:
     else:
         result = RESULT_TIE
 
-    print(f"    [ROUND] Final totals: player={ps}, dealer={ds} -> result={result}")
-    send_card(conn, last_card_sent, result)
+    log.debug("    [ROUND] Final totals: player=%d, dealer=%d -> result=%d", ps, ds, result)
+    pending.append(server_payload(result, *last_card_sent))
+    await send_payloads(conn, pending)
     return result
 
 
-def handle_client(conn: socket.socket, addr):
-    conn.settimeout(TCP_CLIENT_TIMEOUT)
+async def handle_client(conn: socket.socket, addr):
+    buf = _get_buf()
     try:
-        req = recv_exact(conn, REQUEST_SIZE)
-        if req is None:
+        tune_tcp_socket(conn)
+        if not await recv_from_client(conn, buf, REQUEST_SIZE):
             return
-        parsed = unpack_request(req)
+        parsed = unpack_request(buf)
         if not parsed:
             print(f"[SERVER] Invalid request from {addr}. Closing.")
             return
@@ -168,44 +267,112 @@ def handle_client(conn: socket.socket, addr):
 
         print(f"[SERVER] Client '{client_name}' connected from {addr} for {rounds} rounds")
 
+        deck = create_deck()
         for i in range(1, rounds + 1):
-            print(f"[SERVER] --- Round {i}/{rounds} for '{client_name}' ---")
-            play_one_round(conn)
+            log.debug("[SERVER] --- Round %d/%d for '%s' ---", i, rounds, client_name)
+            await play_one_round(conn, buf, deck)
+            # Top the shoe up between rounds; skipped after the last round since no deal follows.
+            if i < rounds and len(deck) < RESHUFFLE_THRESHOLD:
+                deck[:] = create_deck()
 
         print(f"[SERVER] Finished session for '{client_name}' ({addr})")
 
-    except socket.timeout:
+    except asyncio.TimeoutError:
         print(f"[SERVER] Timeout waiting for client {addr}. Closing.")
     except (ConnectionError, OSError) as e:
         print(f"[SERVER] Connection error with {addr}: {e}")
     finally:
+        _put_buf(buf)
         try:
             conn.close()
         except OSError:
             pass
 
 
-def main():
+async def serve(tcp: socket.socket, tcp_port: int, broadcast: bool = True):
+    """One event loop: accepts connections and multiplexes every session (plus the broadcaster, if asked)."""
+    loop = asyncio.get_running_loop()
+    if hasattr(signal, "SIGTERM"):
+        try:
+            # Treat SIGTERM like Ctrl+C so workers are always torn down with the parent.
+            loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except NotImplementedError:
+            pass
+    broadcaster = asyncio.create_task(udp_broadcast_loop(tcp_port)) if broadcast else None
+    sessions = set()  # keep strong references to running session tasks
+    try:
+        while True:
+            conn, addr = await loop.sock_accept(tcp)
+            task = asyncio.create_task(handle_client(conn, addr))
+            sessions.add(task)
+            task.add_done_callback(sessions.discard)
+    finally:
+        if broadcaster:
+            broadcaster.cancel()
+
+
+def make_listener(port: int) -> socket.socket:
     tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    tcp.bind(("", 0))  # pick an available port
+    if hasattr(socket, "SO_REUSEPORT"):
+        try:
+            tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        except OSError:
+            pass
+    tcp.bind(("", port))
     tcp.listen(TCP_BACKLOG)
+    tcp.setblocking(False)
+    return tcp
+
+
+def _pin_to_cpu(index: int):
+    if hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {USABLE_CPUS[index % len(USABLE_CPUS)]})
+        except OSError:
+            pass
+
+
+def worker_main(tcp_port: int, index: int):
+    """Extra accept worker: its own listener on the shared port, its own event loop."""
+    _pin_to_cpu(index)
+    logging.basicConfig(format="%(message)s", level=LOG_LEVEL)
+    tcp = make_listener(tcp_port)
+    try:
+        asyncio.run(serve(tcp, tcp_port, broadcast=False))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        tcp.close()
+
+
+def main():
+    logging.basicConfig(format="%(message)s", level=LOG_LEVEL)
+    tcp = make_listener(0)  # pick an available port; workers join it via SO_REUSEPORT
     ip = get_local_ip()
     tcp_port = tcp.getsockname()[1]
     print(f"Server started, listening on IP address {ip} (TCP port {tcp_port})")
 
-    stop_event = threading.Event()
-    t = threading.Thread(target=udp_broadcast_loop, args=(tcp_port, stop_event), daemon=True)
-    t.start()
+    # Linux spreads new connections across every listener bound with SO_REUSEPORT.
+    # macOS/BSD accept SO_REUSEPORT but do not balance TCP accepts, so stay single-process there.
+    workers = []
+    if sys.platform.startswith("linux") and hasattr(socket, "SO_REUSEPORT"):
+        # "spawn", not fork: a forked worker would inherit our listener without ever accepting
+        # on it, stranding the connections the kernel hashes there if this process is killed.
+        ctx = multiprocessing.get_context("spawn")
+        for i in range(1, WORKER_COUNT):
+            w = ctx.Process(target=worker_main, args=(tcp_port, i), daemon=True)
+            w.start()
+            workers.append(w)
+    _pin_to_cpu(0)
 
     try:
-        while True:
-            conn, addr = tcp.accept()
-            threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
-    except KeyboardInterrupt:
+        asyncio.run(serve(tcp, tcp_port))
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print("\n[SERVER] Shutting down...")
     finally:
-        stop_event.set()
+        for w in workers:
+            w.terminate()
         try:
             tcp.close()
         except OSError: